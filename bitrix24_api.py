@@ -1,23 +1,324 @@
-import requests
-from config import WEBHOOK_URL
+import fcntl
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+# requests и multiprocessing импортируются при первом использовании, чтобы не замедлять запуск
+from config import (
+    WEBHOOK_URL, TRANSPORT_MODE, CASSETTE_PATH, REPLAY_LATENCY,
+    API_REQUEST_QUOTA, API_QUOTA_WINDOW, API_REQUESTS_PER_SECOND, API_REQUEST_TIMEOUT,
+)
+
+# Заголовок записи в файле кассеты: длина сжатого тела (4 байта)
+_RECORD_HEADER = struct.Struct('<I')
+
+# Метки времени в фильтрах зависят от момента запуска и не входят в ключ кассеты
+_TIMESTAMP_RE = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}[+-]?\d{0,4}')
+
+
+
+class SharedRateLimiter:
+    """
+    Бюджет запросов портала: не более requests_per_second запросов в секунду
+    и не более request_quota запросов за окно API_QUOTA_WINDOW.
+
+    Состояние хранится в разделяемой памяти, поэтому один объект, созданный
+    до запуска процессов (шардов, пула порталов), учитывает запросы всех потоков
+    и процессов портала.
+    """
+
+    # Окно квоты делится на интервалы, запросы считаются по интервалам
+    QUOTA_SLOTS = 60
+
+    def __init__(self, requests_per_second, request_quota=API_REQUEST_QUOTA):
+        import multiprocessing
+
+        self.requests_per_second = requests_per_second
+        self.request_quota = request_quota
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self.slot_length = API_QUOTA_WINDOW / self.QUOTA_SLOTS
+        self.lock = multiprocessing.Lock()
+        self.next_time = multiprocessing.RawValue('d', 0.0)
+        self.slot_ids = multiprocessing.RawArray('q', self.QUOTA_SLOTS)
+        self.slot_counts = multiprocessing.RawArray('q', self.QUOTA_SLOTS)
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time.value - now
+            request_time = max(now, self.next_time.value)
+            self.next_time.value = request_time + self.interval
+            self._count_request(request_time)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _count_request(self, moment):
+        slot_id = int(moment // self.slot_length)
+        index = slot_id % self.QUOTA_SLOTS
+        if self.slot_ids[index] != slot_id:
+            self.slot_ids[index] = slot_id
+            self.slot_counts[index] = 0
+        self.slot_counts[index] += 1
+
+    def remaining_quota(self):
+        """
+        Доля квоты запросов, оставшаяся в текущем окне (от 0 до 1).
+        """
+        with self.lock:
+            current_slot = int(time.monotonic() // self.slot_length)
+            used = sum(
+                count for slot_id, count in zip(self.slot_ids, self.slot_counts)
+                if slot_id > current_slot - self.QUOTA_SLOTS
+            )
+        return max(0, self.request_quota - used) / self.request_quota
+
+
+# Портал, с которым работает процесс (см. configure)
+_webhook_url = WEBHOOK_URL
+_cassette_path = CASSETTE_PATH
+_requests_per_second = API_REQUESTS_PER_SECOND
+_request_quota = API_REQUEST_QUOTA
+# Бюджет запросов портала создается при первом использовании (см. get_rate_limiter)
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+# Состояние кассеты: файл записи или отображение файла в память для воспроизведения
+_cassette = None
+_cassette_lock = threading.Lock()
+
+# Крайний срок запросов (time.monotonic) для проверки, выполняемой в текущем потоке
+_run_state = threading.local()
+
+
+class RunBudgetExceeded(Exception):
+    """
+    Исключение, прерывающее проверку, которая не уложилась в отведенное время.
+    """
+
+
+def configure(webhook_url, requests_per_second=API_REQUESTS_PER_SECOND,
+              request_quota=API_REQUEST_QUOTA, cassette_path=CASSETTE_PATH, rate_limiter=None):
+    """
+    Переключение модуля на другой портал: свой вебхук, бюджет запросов и кассета.
+    Если rate_limiter не передан, бюджет портала создается заново при первом запросе.
+    """
+    global _webhook_url, _cassette_path, _requests_per_second, _request_quota, _rate_limiter, _cassette
+    _webhook_url = webhook_url
+    _cassette_path = cassette_path
+    _requests_per_second = requests_per_second
+    _request_quota = request_quota
+    _rate_limiter = rate_limiter
+    _cassette = None
+
+
+def get_webhook_url():
+    """
+    Вебхук портала, с которым работает процесс.
+    """
+    return _webhook_url
+
+
+def get_rate_limiter():
+    """
+    Бюджет запросов текущего портала. Создается один раз на портал и передается
+    процессам-обработчикам, чтобы все они расходовали общий бюджет.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = SharedRateLimiter(_requests_per_second, _request_quota)
+        return _rate_limiter
+
+
+def get_portal_settings():
+    """
+    Настройки текущего портала в виде аргументов для configure.
+    """
+    return {
+        'webhook_url': _webhook_url,
+        'requests_per_second': _requests_per_second,
+        'request_quota': _request_quota,
+        'cassette_path': _cassette_path,
+    }
+
+
+def set_deadline(deadline):
+    """
+    Установка крайнего срока для запросов текущего запуска проверки
+    (действует только в текущем потоке; None - без ограничения).
+    """
+    _run_state.deadline = deadline
+
+
+def get_deadline():
+    """
+    Крайний срок запросов текущего запуска проверки в текущем потоке.
+    """
+    return getattr(_run_state, 'deadline', None)
+
+
+def get_remaining_quota():
+    """
+    Доля квоты запросов текущего портала, оставшаяся в текущем окне (от 0 до 1).
+    """
+    return get_rate_limiter().remaining_quota()
+
+
+def _request_key(method, params, http_method):
+    """
+    Ключ запроса для индекса кассеты: метод + HTTP-метод + параметры в каноническом виде.
+    """
+    params_str = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{http_method} {method} {_TIMESTAMP_RE.sub('<time>', params_str)}"
+
+
+class CassetteRecorder:
+    """
+    Запись пар запрос/ответ в сжатый файл, открытый только на дозапись.
+    Рядом с файлом данных ведется индекс (по строке JSON на запись).
+
+    В одну кассету могут писать несколько процессов (шардирование) и потоков
+    (задачи планировщика), поэтому запись выполняется под блокировкой потоков
+    и блокировкой файла, а смещение определяется по концу файла после получения
+    блокировок.
+    """
+
+    def __init__(self, path):
+        self.data_file = open(path, 'ab')
+        self.index_file = open(f"{path}.idx", 'a', encoding='utf-8')
+        # Блокировка файла действует на процесс целиком, потоки процесса разделяются отдельно
+        self.lock = threading.Lock()
+
+    def record(self, key, data, latency):
+        body = zlib.compress(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+        with self.lock:
+            fcntl.flock(self.data_file, fcntl.LOCK_EX)
+            try:
+                offset = self.data_file.seek(0, os.SEEK_END) + _RECORD_HEADER.size
+                self.data_file.write(_RECORD_HEADER.pack(len(body)))
+                self.data_file.write(body)
+                self.data_file.flush()
+
+                entry = {'key': key, 'offset': offset, 'length': len(body), 'latency': latency}
+                self.index_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self.index_file.flush()
+            finally:
+                fcntl.flock(self.data_file, fcntl.LOCK_UN)
+
+
+class CassettePlayer:
+    """
+    Воспроизведение ответов из кассеты. Файл данных отображается в память (mmap),
+    ответы распаковываются прямо из отображения без промежуточного копирования.
+    """
+
+    def __init__(self, path):
+        self.data_file = open(path, 'rb')
+        if os.fstat(self.data_file.fileno()).st_size:
+            self.view = memoryview(mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            # Пустую кассету нельзя отобразить в память
+            self.view = memoryview(b'')
+
+        # Для каждого ключа - список записей и позиция следующей выдачи
+        self.index = {}
+        self.positions = {}
+        with open(f"{path}.idx", encoding='utf-8') as index_file:
+            for line in index_file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.index.setdefault(entry['key'], []).append(entry)
+
+    def replay(self, key):
+        entries = self.index.get(key)
+        if not entries:
+            print(f"Запрос отсутствует в кассете: {key}")
+            return None
+
+        # Повторяющиеся запросы выдаются по порядку записи, последний ответ повторяется
+        position = self.positions.get(key, 0)
+        entry = entries[min(position, len(entries) - 1)]
+        self.positions[key] = position + 1
+
+        if REPLAY_LATENCY:
+            time.sleep(entry['latency'])
+
+        body = self.view[entry['offset']:entry['offset'] + entry['length']]
+        return json.loads(zlib.decompress(body))
+
+
+def _get_cassette():
+    """
+    Ленивая инициализация кассеты для режимов 'record' и 'replay'.
+    """
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            if TRANSPORT_MODE == 'record':
+                _cassette = CassetteRecorder(_cassette_path)
+            elif TRANSPORT_MODE == 'replay':
+                _cassette = CassettePlayer(_cassette_path)
+        return _cassette
+
+
+def reset_replay():
+    """
+    Сброс позиций воспроизведения кассеты: повторяющиеся запросы снова
+    получают ответы с первой записи (для сопоставимых повторных запусков).
+    """
+    if isinstance(_cassette, CassettePlayer):
+        _cassette.positions.clear()
+
 
 def call_api(method, params=None, http_method='GET'):
     """
     Универсальная функция для вызова методов API Bitrix24.
+
+    В режиме 'record' каждая пара запрос/ответ сохраняется в кассету,
+    в режиме 'replay' ответы берутся из кассеты без обращения к сети.
     """
-    url = f"{WEBHOOK_URL}{method}"
+    deadline = get_deadline()
+    if deadline is not None and time.monotonic() > deadline:
+        raise RunBudgetExceeded(f"Превышено время на выполнение проверки (метод {method}).")
+
+    if TRANSPORT_MODE == 'replay':
+        return _get_cassette().replay(_request_key(method, params, http_method))
+
+    import requests
+
+    url = f"{_webhook_url}{method}"
+
+    get_rate_limiter().acquire()
+
+    # Ожидание ответа не выходит за крайний срок проверки
+    timeout = API_REQUEST_TIMEOUT
+    if deadline is not None:
+        timeout = max(0.1, min(timeout, deadline - time.monotonic()))
 
     try:
+        started = time.perf_counter()
         if http_method == 'GET':
-            response = requests.get(url, params=params)
+            response = requests.get(url, params=params, timeout=timeout)
         elif http_method == 'POST':
-            response = requests.post(url, json=params)
+            response = requests.post(url, json=params, timeout=timeout)
         else:
             raise ValueError("Недопустимый метод HTTP.")
-        
+
         response.raise_for_status()
         data = response.json()
-        return data
+        latency = time.perf_counter() - started
+    except requests.exceptions.Timeout as timeout_err:
+        if deadline is not None and time.monotonic() > deadline:
+            raise RunBudgetExceeded(f"Превышено время на выполнение проверки (метод {method}).") from timeout_err
+        print(f"Превышено время ожидания ответа: {timeout_err}")
+        return None
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP ошибка: {http_err}")
         print("Детали ошибки:", response.text)
@@ -25,3 +326,12 @@ def call_api(method, params=None, http_method='GET'):
     except Exception as err:
         print(f"Другая ошибка: {err}")
         return None
+
+    if TRANSPORT_MODE == 'record':
+        # Ошибка записи кассеты не отменяет полученный ответ
+        try:
+            _get_cassette().record(_request_key(method, params, http_method), data, latency)
+        except Exception as err:
+            print(f"Не удалось записать ответ в кассету: {err}")
+
+    return data
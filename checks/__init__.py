@@ -1,4 +1,44 @@
-from .check_overdue_tasks import check_overdue_activities
-from .check_next_step_missing import check_next_step_missing
-from .check_deal_not_moved import check_deal_not_moved
-from .check_contact_name_missing import check_contact_name_missing
\ No newline at end of file
+import importlib
+
+import config
+
+# Модули проверок по именам (имена совпадают с ключами config.CHECK_INTERVALS).
+# Модуль импортируется только при первом обращении к проверке.
+CHECK_MODULES = {
+    'check_overdue_activities': 'check_overdue_tasks',
+    'check_next_step_missing': 'check_next_step_missing',
+    'check_deal_not_moved': 'check_deal_not_moved',
+    'check_contact_name_missing': 'check_contact_name_missing',
+}
+
+__all__ = list(CHECK_MODULES) + ['CHECK_MODULES', 'CHECKS', 'get_check_function', 'get_check']
+
+
+def get_check_function(name):
+    """
+    Функция проверки по имени (с импортом ее модуля).
+    """
+    module = importlib.import_module(f".{CHECK_MODULES[name]}", __name__)
+    function = getattr(module, name)
+    # Импорт подмодуля перекрывает одноименный атрибут пакета, восстанавливаем функцию
+    globals()[name] = function
+    return function
+
+
+def get_check(name):
+    """
+    Функция проверки по имени: с шардированием, если оно включено для этой проверки.
+    """
+    if config.SHARD_WORKERS > 1 and name in config.SHARDED_CHECKS:
+        import sharding
+        if name in sharding.SHARDABLE_CHECKS:
+            return lambda: sharding.run_sharded_check(name)
+    return get_check_function(name)
+
+
+def __getattr__(name):
+    if name in CHECK_MODULES:
+        return get_check_function(name)
+    if name == 'CHECKS':
+        return {check_name: get_check_function(check_name) for check_name in CHECK_MODULES}
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,20 +3,43 @@ import pytz
 from bitrix24_api import call_api
 from utils.user_utils import get_user_names
 
-def get_contacts_without_name():
+# Фильтр контактов без заполненного имени
+CONTACTS_FILTER = {
+    'NAME': 'Без имени',  # Имя не указано 
+    '!PHONE': ''  # У контакта есть телефон
+}
+
+
+def get_max_contact_id():
+    """
+    Функция для получения наибольшего ID среди контактов без заполненного имени.
+    """
+    params = {
+        'filter': CONTACTS_FILTER,
+        'order': {'ID': 'DESC'},
+        'select': ['ID']
+    }
+    data = call_api('crm.contact.list', params=params, http_method='POST')
+
+    if data and 'result' in data and data['result']:
+        return int(data['result'][0]['ID'])
+    return 0
+
+
+def get_contacts_without_name(id_range=None):
     """
     Функция для получения контактов без заполненного имени.
+    Если задан id_range = (first_id, last_id), выбираются только контакты с ID в этом диапазоне.
     """
     CONTACTS_METHOD = 'crm.contact.list'
 
     # Параметры запроса
     params = {
-        'filter': {
-            'NAME': 'Без имени',  # Имя не указано 
-            '!PHONE': ''  # У контакта есть телефон
-        },
+        'filter': dict(CONTACTS_FILTER),
         'select': ['ID', 'NAME', 'LAST_NAME', 'PHONE', 'ASSIGNED_BY_ID', 'CREATED_BY_ID']
     }
+    if id_range:
+        params['filter']['>=ID'], params['filter']['<=ID'] = id_range
 
     all_contacts = []
     start = 0
@@ -95,13 +118,10 @@ def get_first_call_time(contact_id):
     # Если не нашли подходящей активности
     return None    
 
-def check_contact_name_missing():
+def find_contacts_to_notify(contacts):
     """
-    Проверка контактов, у которых не заполнено имя клиента и прошло более 3 часов с момента первого звонка.
+    Отбор контактов без имени, у которых прошло более 3 часов с момента первого звонка.
     """
-    contacts = get_contacts_without_name()
-    print(f"[Проверка 4] Контактов без имени: {len(contacts)}")
-
     contacts_to_notify = []
 
     timezone = pytz.timezone('Europe/Moscow')
@@ -137,6 +157,13 @@ def check_contact_name_missing():
             # Если звонков не было, пропускаем контакт
             continue
 
+    return contacts_to_notify
+
+
+def report_contacts_to_notify(contacts_to_notify):
+    """
+    Вывод списка контактов без имени.
+    """
     print(f"Контактов без имени, у которых прошло более 3 часов с момента первого звонка: {len(contacts_to_notify)}")
 
     if contacts_to_notify:
@@ -170,5 +197,16 @@ def check_contact_name_missing():
     else:
         print("Нет контактов, соответствующих условиям.")
 
+
+def check_contact_name_missing():
+    """
+    Проверка контактов, у которых не заполнено имя клиента и прошло более 3 часов с момента первого звонка.
+    """
+    contacts = get_contacts_without_name()
+    print(f"[Проверка 4] Контактов без имени: {len(contacts)}")
+
+    contacts_to_notify = find_contacts_to_notify(contacts)
+    report_contacts_to_notify(contacts_to_notify)
+
     # Если потребуется, можно вернуть список для дальнейшей обработки
     return contacts_to_notify
\ No newline at end of file
@@ -3,20 +3,43 @@ import pytz
 from bitrix24_api import call_api
 from utils.user_utils import get_user_names
 
-def get_deals_in_general_pipeline():
+# Фильтр активных сделок в воронке 'Общая'
+DEALS_FILTER = {
+    'CATEGORY_ID': 0,  # 'Общая' воронка, убедитесь, что CATEGORY_ID соответствует вашей системе
+    'CLOSED': 'N'      # Только незакрытые сделки
+}
+
+
+def get_max_deal_id():
+    """
+    Функция для получения наибольшего ID среди активных сделок в воронке 'Общая'.
+    """
+    params = {
+        'filter': DEALS_FILTER,
+        'order': {'ID': 'DESC'},
+        'select': ['ID']
+    }
+    data = call_api('crm.deal.list', params=params, http_method='POST')
+
+    if data and 'result' in data and data['result']:
+        return int(data['result'][0]['ID'])
+    return 0
+
+
+def get_deals_in_general_pipeline(id_range=None):
     """
     Функция для получения всех активных сделок в воронке 'Общая' (CATEGORY_ID = 0).
+    Если задан id_range = (first_id, last_id), выбираются только сделки с ID в этом диапазоне.
     """
     DEALS_METHOD = 'crm.deal.list'
 
     # Параметры запроса
     params = {
-        'filter': {
-            'CATEGORY_ID': 0,  # 'Общая' воронка, убедитесь, что CATEGORY_ID соответствует вашей системе
-            'CLOSED': 'N'      # Только незакрытые сделки
-        },
+        'filter': dict(DEALS_FILTER),
         'select': ['ID', 'TITLE', 'STAGE_ID', 'DATE_CREATE', 'DATE_MODIFY', 'ASSIGNED_BY_ID']
     }
+    if id_range:
+        params['filter']['>=ID'], params['filter']['<=ID'] = id_range
 
     all_deals = []
     start = 0
@@ -112,13 +135,10 @@ def get_last_activity_time(deal_id):
         return None
     
 
-def check_deal_not_moved():
+def find_deals_not_moved(deals):
     """
-    Проверка сделок, которые не были переведены по воронке в течение 6 часов после совершенного действия.
+    Отбор сделок, которые не были переведены по воронке в течение 6 часов после последнего действия.
     """
-    deals = get_deals_in_general_pipeline()
-    print(f"[Проверка 3] Активных сделок в 'Общей' воронке: {len(deals)}")
-
     deals_not_moved = []
 
     timezone = pytz.timezone('Europe/Moscow')
@@ -159,6 +179,13 @@ def check_deal_not_moved():
                     'hours_since_last_activity': time_since_last_activity.total_seconds() / 3600
                 })
 
+    return deals_not_moved
+
+
+def report_deals_not_moved(deals_not_moved):
+    """
+    Вывод списка сделок, не переведенных по воронке.
+    """
     print(f"Сделок, не переведенных по воронке в течение 6 часов после последнего действия: {len(deals_not_moved)}")
 
     if deals_not_moved:
@@ -174,5 +201,16 @@ def check_deal_not_moved():
     else:
         print("Все сделки были переведены по воронке в течение 6 часов после последнего действия.")
 
+
+def check_deal_not_moved():
+    """
+    Проверка сделок, которые не были переведены по воронке в течение 6 часов после совершенного действия.
+    """
+    deals = get_deals_in_general_pipeline()
+    print(f"[Проверка 3] Активных сделок в 'Общей' воронке: {len(deals)}")
+
+    deals_not_moved = find_deals_not_moved(deals)
+    report_deals_not_moved(deals_not_moved)
+
     # Если потребуется, можно вернуть список для дальнейшей обработки
     return deals_not_moved
@@ -0,0 +1,160 @@
+"""
+Командная строка проверок Bitrix24: python -m cli <команда>.
+
+    run [проверки...]             - однократный запуск проверок (по умолчанию всех)
+    schedule                      - запуск планировщика
+    warm                          - предварительная компиляция модулей (кэш байт-кода)
+    bench [проверки...] -n ЧИСЛО  - замер длительности проверок
+
+Модули импортируются только для выбранной команды и проверок.
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+
+def report_startup():
+    """
+    Вывод времени запуска: от начала импорта cli до выполнения команды.
+    """
+    elapsed_ms = (time.perf_counter() - _STARTED) * 1000
+    print(f"Время запуска: {elapsed_ms:.0f} мс, модулей загружено: {len(sys.modules)}", file=sys.stderr)
+
+
+def get_check_names(names):
+    """
+    Проверка имен проверок из командной строки; без имен - все проверки.
+    """
+    from checks import CHECK_MODULES
+
+    unknown = [name for name in names if name not in CHECK_MODULES]
+    if unknown:
+        raise SystemExit(f"Неизвестные проверки: {', '.join(unknown)}. Доступны: {', '.join(CHECK_MODULES)}")
+    return names or list(CHECK_MODULES)
+
+
+def command_run(args):
+    import config
+
+    names = get_check_names(args.checks)
+    config.check_webhook_url()
+
+    if config.PORTALS_FILE:
+        import portals
+        report_startup()
+        reports = portals.run_portals(portals.load_portals(), checks=names)
+        return 1 if any(report['errors'] for report in reports) else 0
+
+    from checks import get_check
+    checks = [(name, get_check(name)) for name in names]
+    report_startup()
+
+    exit_code = 0
+    for name, check in checks:
+        try:
+            check()
+        except Exception as e:
+            print(f"[{name}] Произошла ошибка во время выполнения проверки: {e}")
+            exit_code = 1
+    return exit_code
+
+
+def command_schedule(args):
+    import main
+
+    report_startup()
+    main.main('schedule')
+    return 0
+
+
+def command_warm(args):
+    import compileall
+    import re
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    # Каталоги окружения и служебные каталоги не компилируем
+    success = compileall.compile_dir(root, quiet=1, rx=re.compile(r'[/\\](\.|venv|__pycache__)'))
+    report_startup()
+    print("Байт-код модулей подготовлен." if success else "Не все модули удалось скомпилировать.")
+    return 0 if success else 1
+
+
+def command_bench(args):
+    import io
+    import statistics
+    from contextlib import redirect_stdout
+
+    import config
+    import bitrix24_api
+    from checks import get_check
+    from utils.user_utils import clear_user_names_cache
+
+    names = get_check_names(args.checks)
+    config.check_webhook_url()
+    report_startup()
+    print(f"Режим транспорта: {config.TRANSPORT_MODE}, повторов: {args.repeat}")
+
+    exit_code = 0
+    for name in names:
+        check = get_check(name)
+        durations = []
+        try:
+            for _ in range(args.repeat):
+                # Каждый повтор начинается с пустого кэша и с начала кассеты, чтобы замеры были сопоставимы
+                clear_user_names_cache()
+                bitrix24_api.reset_replay()
+                started = time.perf_counter()
+                # Вывод проверок подавляется, чтобы не искажать замер
+                with redirect_stdout(io.StringIO()):
+                    result = check()
+                durations.append(time.perf_counter() - started)
+        except Exception as e:
+            print(f"{name}: ошибка во время выполнения проверки: {e}")
+            exit_code = 1
+            continue
+        print(
+            f"{name}: мин {min(durations):.3f} с, медиана {statistics.median(durations):.3f} с, "
+            f"макс {max(durations):.3f} с, найдено {len(result)}"
+        )
+    return exit_code
+
+
+def positive_int(value):
+    """
+    Тип аргумента командной строки: целое число не меньше 1.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"ожидается целое число не меньше 1: {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cli', description="Проверки CRM Bitrix24")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="однократный запуск проверок")
+    run_parser.add_argument('checks', nargs='*', help="имена проверок (по умолчанию все)")
+    run_parser.set_defaults(handler=command_run)
+
+    schedule_parser = subparsers.add_parser('schedule', help="запуск планировщика")
+    schedule_parser.set_defaults(handler=command_schedule)
+
+    warm_parser = subparsers.add_parser('warm', help="предварительная компиляция модулей")
+    warm_parser.set_defaults(handler=command_warm)
+
+    bench_parser = subparsers.add_parser('bench', help="замер длительности проверок")
+    bench_parser.add_argument('checks', nargs='*', help="имена проверок (по умолчанию все)")
+    bench_parser.add_argument('-n', '--repeat', type=positive_int, default=5, help="число повторов каждой проверки")
+    bench_parser.set_defaults(handler=command_bench)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,9 +5,69 @@ load_dotenv()
 
 # Настройки
 WEBHOOK_URL = os.getenv('BITRIX24_WEBHOOK_URL')
+# Рабочее время планировщика: проверки запускаются с первого до последнего часа
+# из SCHEDULE_HOURS (в минуту SCHEDULE_MINUTE) в дни SCHEDULE_DAYS
 SCHEDULE_HOURS = os.getenv('SCHEDULE_HOURS', '10,12,14,16,18')
 SCHEDULE_MINUTE = int(os.getenv('SCHEDULE_MINUTE', '0'))
 SCHEDULE_DAYS = os.getenv('SCHEDULE_DAYS', 'mon-fri') 
 
-if not WEBHOOK_URL:
-    raise ValueError("WEBHOOK_URL не установлен. Пожалуйста, проверьте файл .env.")
+# Режим запуска: 'test' - однократный запуск всех проверок, 'schedule' - планировщик
+RUN_MODE = os.getenv('RUN_MODE', 'test')
+
+# Периодичность каждой проверки в минутах
+CHECK_INTERVALS = {
+    'check_overdue_activities': int(os.getenv('CHECK_OVERDUE_ACTIVITIES_MINUTES', '60')),
+    'check_next_step_missing': int(os.getenv('CHECK_NEXT_STEP_MISSING_MINUTES', '60')),
+    'check_deal_not_moved': int(os.getenv('CHECK_DEAL_NOT_MOVED_MINUTES', '120')),
+    'check_contact_name_missing': int(os.getenv('CHECK_CONTACT_NAME_MISSING_MINUTES', '60')),
+}
+# Допустимое опоздание запуска проверки, в секундах
+SCHEDULE_MISFIRE_GRACE = int(os.getenv('SCHEDULE_MISFIRE_GRACE_SECONDS', '300'))
+# Доля интервала, которую может занимать один запуск проверки
+SCHEDULE_RUN_BUDGET = float(os.getenv('SCHEDULE_RUN_BUDGET', '0.8'))
+# Во сколько раз адаптивный интервал может превышать заданный
+SCHEDULE_MAX_INTERVAL_FACTOR = float(os.getenv('SCHEDULE_MAX_INTERVAL_FACTOR', '4'))
+
+# Квота запросов к API: не более API_REQUEST_QUOTA запросов за API_QUOTA_WINDOW секунд
+API_REQUEST_QUOTA = int(os.getenv('API_REQUEST_QUOTA', '5000'))
+API_QUOTA_WINDOW = int(os.getenv('API_QUOTA_WINDOW_SECONDS', '3600'))
+# Наибольшее время ожидания ответа API, в секундах
+API_REQUEST_TIMEOUT = float(os.getenv('API_REQUEST_TIMEOUT_SECONDS', '30'))
+# Ограничение частоты запросов к API (Bitrix24 допускает 2 запроса в секунду)
+API_REQUESTS_PER_SECOND = float(os.getenv('API_REQUESTS_PER_SECOND', '2'))
+
+# Срок хранения имен пользователей в кэше, в секундах
+USER_NAMES_CACHE_TTL = int(os.getenv('USER_NAMES_CACHE_TTL_SECONDS', '3600'))
+
+# Файл со списком порталов (JSON) для многопортального режима, см. portals.py
+PORTALS_FILE = os.getenv('BITRIX24_PORTALS_FILE')
+# Число процессов для параллельного запуска проверок по порталам (по умолчанию - число ядер)
+PORTAL_WORKERS = int(os.getenv('PORTAL_WORKERS', '0')) or None
+
+# Шардирование проверок по диапазонам ID: число процессов (0 - без шардирования)
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))
+# Проверки, выполняемые с шардированием
+SHARDED_CHECKS = os.getenv('SHARDED_CHECKS', 'check_deal_not_moved,check_contact_name_missing').split(',')
+# Число диапазонов ID на один процесс
+SHARDS_PER_WORKER = int(os.getenv('SHARDS_PER_WORKER', '4'))
+# Сколько раз диапазон может быть отдан заново после падения процесса
+SHARD_MAX_ATTEMPTS = int(os.getenv('SHARD_MAX_ATTEMPTS', '3'))
+
+# Транспорт API: 'live' - обычные запросы, 'record' - запросы с записью в кассету,
+# 'replay' - ответы из кассеты без обращения к сети
+TRANSPORT_MODE = os.getenv('BITRIX24_TRANSPORT_MODE', 'live')
+CASSETTE_PATH = os.getenv('BITRIX24_CASSETTE_PATH', 'bitrix24_cassette.bin')
+# Воспроизводить ли записанные задержки ответов в режиме 'replay'
+REPLAY_LATENCY = os.getenv('BITRIX24_REPLAY_LATENCY', '0') == '1'
+
+if TRANSPORT_MODE not in ('live', 'record', 'replay'):
+    raise ValueError(f"Недопустимый режим транспорта: {TRANSPORT_MODE}. Допустимы: live, record, replay.")
+
+
+def check_webhook_url():
+    """
+    Проверка настроек портала. Вызывается командами, которые обращаются к API,
+    чтобы остальные команды работали и без файла .env.
+    """
+    if not WEBHOOK_URL and not PORTALS_FILE and TRANSPORT_MODE != 'replay':
+        raise ValueError("WEBHOOK_URL не установлен. Пожалуйста, проверьте файл .env.")
@@ -1,11 +1,12 @@
+import time
+
 import config
 import pytz
 
-from apscheduler.schedulers.blocking import BlockingScheduler
-from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime
 
-from checks import *
+import bitrix24_api
+from checks import get_check
 
 
 def run_checks():
@@ -18,46 +19,183 @@ def run_checks():
 
     try:
         # Проверка 1
-        check_overdue_activities()
+        get_check('check_overdue_activities')()
         # Проверка 2
-        check_next_step_missing()
+        get_check('check_next_step_missing')()
         # Проверка 3
-        check_deal_not_moved()
+        get_check('check_deal_not_moved')()
         # Проверка 4
-        check_contact_name_missing()
+        get_check('check_contact_name_missing')()
     except Exception as e:
         raise Exception(f"Произошла ошибка во время выполнения проверок: {str(e)}")
 
 
-def main():
+class WorkingHours:
+    """
+    Рабочее время планировщика: дни SCHEDULE_DAYS, с первого до последнего часа
+    из SCHEDULE_HOURS в минуту SCHEDULE_MINUTE (по умолчанию с 10:00 до 18:00 МСК).
     """
-    Главная функция, устанавливающая планировщик для запуска проверок.
+
+    def __init__(self):
+        from apscheduler.triggers.cron import CronTrigger
+
+        hours = [int(hour) for hour in config.SCHEDULE_HOURS.split(',')]
+        self.start = (min(hours), config.SCHEDULE_MINUTE)
+        self.end = (max(hours), config.SCHEDULE_MINUTE)
+        # Триггер срабатывает в полночь рабочих дней
+        self.days = CronTrigger(day_of_week=config.SCHEDULE_DAYS, timezone='Europe/Moscow')
+
+    def __contains__(self, moment):
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.days.get_next_fire_time(None, midnight) != midnight:
+            return False
+        return self.start <= (moment.hour, moment.minute) <= self.end
+
+
+class CheckJob:
     """
+    Задача планировщика для одной проверки.
+
+    Запуск ограничен бюджетом времени (доля интервала до следующего запуска):
+    если по длительности прошлого запуска проверка не успеет завершиться, она
+    пропускается, а затянувшийся запуск прерывается. Интервал подстраивается
+    под длительность прошлого запуска и оставшуюся квоту запросов; после
+    прерванного запуска интервал удваивается.
+    """
+
+    def __init__(self, scheduler, name, check, interval_minutes, working_hours, rate_limiter=None):
+        self.scheduler = scheduler
+        self.name = name
+        self.check = check
+        # Бюджет запросов портала, по которому оценивается остаток квоты (по умолчанию - текущий портал)
+        self.rate_limiter = rate_limiter
+        self.base_interval = interval_minutes * 60
+        self.interval = self.base_interval
+        self.working_hours = working_hours
+        self.last_duration = None
+        self.truncated = False
+
+    def in_working_hours(self):
+        timezone = pytz.timezone('Europe/Moscow')
+        return datetime.now(timezone) in self.working_hours
+
+    def __call__(self):
+        if not self.in_working_hours():
+            return
+
+        budget = self.interval * config.SCHEDULE_RUN_BUDGET
+        # Длительность прерванного запуска не дает прогноза: она ограничена бюджетом
+        if not self.truncated and self.last_duration is not None and self.last_duration > budget:
+            print(f"[{self.name}] Пропуск: прошлый запуск длился {self.last_duration:.0f} с при бюджете {budget:.0f} с.")
+            # Следующий запуск выполняется без прогноза и при необходимости будет прерван
+            self.last_duration = None
+            return
+
+        started = time.monotonic()
+        self.truncated = False
+        bitrix24_api.set_deadline(started + budget)
+        try:
+            self.check()
+        except bitrix24_api.RunBudgetExceeded as e:
+            print(f"[{self.name}] Проверка прервана: {e}")
+            self.truncated = True
+        except Exception as e:
+            print(f"[{self.name}] Произошла ошибка во время выполнения проверки: {e}")
+        finally:
+            bitrix24_api.set_deadline(None)
+
+        self.last_duration = time.monotonic() - started
+        self.adapt_interval()
 
-    schedule_hours = config.SCHEDULE_HOURS
-    schedule_minute = config.SCHEDULE_MINUTE
-    schedule_days = config.SCHEDULE_DAYS
+    def adapt_interval(self):
+        """
+        Пересчет интервала по длительности прошлого запуска и оставшейся квоте.
+        """
+        from apscheduler.triggers.interval import IntervalTrigger
 
-    # Создаем планировщик
-    scheduler = BlockingScheduler(timezone='Europe/Moscow')
+        max_interval = self.base_interval * config.SCHEDULE_MAX_INTERVAL_FACTOR
 
-    # # Создаем триггер для запуска в 10:00, 12:00, 14:00, 16:00, 18:00 по Москве в будние дни
-    # trigger = CronTrigger(hour=schedule_hours, minute=schedule_minute, day_of_week=schedule_days)
+        if self.truncated:
+            # Полная длительность неизвестна, поэтому увеличиваем интервал вдвое
+            interval = self.interval * 2
+        else:
+            # Интервал, при котором прошлый запуск укладывается в бюджет
+            interval = max(self.base_interval, self.last_duration / config.SCHEDULE_RUN_BUDGET)
 
-    print("Тестовый запуск проверок...\n")
-    run_checks()  # Directly call run_checks for testing purposes
+        # При расходе квоты запускаем проверку реже пропорционально остатку
+        remaining_quota = (self.rate_limiter or bitrix24_api.get_rate_limiter()).remaining_quota()
+        interval /= max(remaining_quota, self.base_interval / max_interval)
+        interval = min(interval, max_interval)
 
-    # # Добавляем задачу в планировщик
-    # scheduler.add_job(run_checks, trigger)
+        if abs(interval - self.interval) >= 60:
+            self.interval = interval
+            self.scheduler.reschedule_job(self.name, trigger=IntervalTrigger(seconds=interval))
+            print(f"[{self.name}] Новый интервал запуска: {interval / 60:.0f} мин.")
+
+
+def run_scheduler():
+    """
+    Запуск планировщика: каждая проверка - отдельная задача со своим интервалом.
+    """
+    # APScheduler нужен только в режиме планировщика
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    scheduler = BlockingScheduler(
+        timezone='Europe/Moscow',
+        job_defaults={
+            'max_instances': 1,  # Запуски одной проверки не пересекаются
+            'coalesce': True,    # Пропущенные запуски объединяются в один
+            'misfire_grace_time': config.SCHEDULE_MISFIRE_GRACE,
+        }
+    )
+    working_hours = WorkingHours()
+    timezone = pytz.timezone('Europe/Moscow')
+
+    for name, interval_minutes in config.CHECK_INTERVALS.items():
+        job = CheckJob(scheduler, name, get_check(name), interval_minutes, working_hours)
+        scheduler.add_job(
+            job,
+            IntervalTrigger(minutes=interval_minutes),
+            id=name,
+            name=name,
+            next_run_time=datetime.now(timezone)
+        )
+        print(f"[{name}] Интервал запуска: {interval_minutes} мин.")
+
+    print("Планировщик проверок запущен.")
+    print(
+        f"Проверки выполняются с {working_hours.start[0]}:{working_hours.start[1]:02d} "
+        f"до {working_hours.end[0]}:{working_hours.end[1]:02d} МСК, дни: {config.SCHEDULE_DAYS}."
+    )
+
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        print("Планировщик остановлен.")
+
+
+def main(run_mode=None):
+    """
+    Главная функция: однократный тестовый запуск проверок или запуск планировщика.
+    Если задан файл порталов, проверки выполняются по всем порталам параллельно.
+    """
+    config.check_webhook_url()
+    run_mode = run_mode or config.RUN_MODE
 
-    # print("Планировщик проверок запущен.")
-    # print("Проверки будут выполняться каждые 2 часа с 10:00 до 18:00 МСК в будние дни.")
+    if config.PORTALS_FILE:
+        import portals
+        portal_list = portals.load_portals()
+        if run_mode == 'schedule':
+            portals.run_portals_scheduler(portal_list)
+        else:
+            portals.run_portals(portal_list)
+    elif run_mode == 'schedule':
+        run_scheduler()
+    else:
+        print("Тестовый запуск проверок...\n")
+        run_checks()  # Directly call run_checks for testing purposes
 
-    # try:
-    #     # Запускаем планировщик
-    #     scheduler.start()
-    # except (KeyboardInterrupt, SystemExit):
-    #     print("Планировщик остановлен.")
 
 if __name__ == "__main__":
     main()
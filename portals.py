@@ -0,0 +1,251 @@
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import pytz
+
+import config
+import bitrix24_api
+from checks import CHECK_MODULES, get_check
+
+
+def load_portals(path=None):
+    """
+    Загрузка списка порталов из JSON-файла.
+
+    Формат: список объектов с полями
+        name                - имя портала (обязательно)
+        webhook_url         - вебхук портала (обязательно)
+        requests_per_second - ограничение частоты запросов
+        request_quota       - квота запросов за окно config.API_QUOTA_WINDOW;
+                              при ее расходе проверки портала запускаются реже
+        checks              - имена запускаемых проверок (по умолчанию все)
+        check_intervals     - интервалы проверок в минутах в режиме планировщика
+                              (по умолчанию из config.CHECK_INTERVALS)
+        cassette_path       - кассета для режимов record/replay
+    """
+    path = path or config.PORTALS_FILE
+    with open(path, encoding='utf-8') as portals_file:
+        portals = json.load(portals_file)
+
+    names = set()
+    for portal in portals:
+        if not portal.get('name') or not portal.get('webhook_url'):
+            raise ValueError(f"У портала должны быть указаны name и webhook_url: {portal}")
+        # По имени портала различаются бюджеты запросов, кассеты и задачи планировщика
+        if portal['name'] in names:
+            raise ValueError(f"Повторяющееся имя портала: {portal['name']}")
+        names.add(portal['name'])
+        if not isinstance(portal.get('checks', []), list):
+            raise ValueError(f"Проверки портала {portal['name']} должны быть указаны списком: {portal['checks']}")
+        unknown_checks = (set(portal.get('checks', CHECK_MODULES)) | set(portal.get('check_intervals', {}))) - set(CHECK_MODULES)
+        if unknown_checks:
+            raise ValueError(f"Неизвестные проверки для портала {portal['name']}: {', '.join(sorted(unknown_checks))}")
+
+    return portals
+
+
+def get_portal_cassette_path(portal):
+    """
+    Путь к кассете портала: явно заданный или производный от config.CASSETTE_PATH.
+    """
+    if portal.get('cassette_path'):
+        return portal['cassette_path']
+    root, ext = os.path.splitext(config.CASSETTE_PATH)
+    return f"{root}_{portal['name']}{ext}"
+
+
+# Бюджеты запросов порталов в процессе пула, по именам порталов (см. create_pool)
+_portal_rate_limiters = {}
+
+
+def create_rate_limiters(portals):
+    """
+    Бюджеты запросов порталов. Создаются в основном процессе до запуска пула,
+    поэтому частота и квота портала общие для всех процессов и запусков.
+    """
+    return {
+        portal['name']: bitrix24_api.SharedRateLimiter(
+            portal.get('requests_per_second', config.API_REQUESTS_PER_SECOND),
+            portal.get('request_quota', config.API_REQUEST_QUOTA)
+        )
+        for portal in portals
+    }
+
+
+def _init_portal_worker(rate_limiters):
+    _portal_rate_limiters.update(rate_limiters)
+
+
+def create_pool(rate_limiters, max_workers):
+    """
+    Пул процессов для проверок порталов с переданными бюджетами запросов.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_portal_worker,
+        initargs=(rate_limiters,)
+    )
+
+
+def run_portal(portal, checks=None, deadline=None):
+    """
+    Запуск проверок одного портала (выполняется в процессе пула).
+
+    Модуль bitrix24_api переключается на портал, поэтому у каждого портала
+    свой бюджет запросов и кассета. Вывод проверок собирается в буфер,
+    чтобы не перемешиваться с выводом других порталов.
+    """
+    bitrix24_api.configure(
+        portal['webhook_url'],
+        requests_per_second=portal.get('requests_per_second', config.API_REQUESTS_PER_SECOND),
+        request_quota=portal.get('request_quota', config.API_REQUEST_QUOTA),
+        cassette_path=get_portal_cassette_path(portal),
+        rate_limiter=_portal_rate_limiters.get(portal['name'])
+    )
+    bitrix24_api.set_deadline(deadline)
+
+    results = {}
+    errors = {}
+    truncated = []
+    output = io.StringIO()
+    started = time.monotonic()
+
+    with redirect_stdout(output):
+        for name in checks or portal.get('checks', CHECK_MODULES):
+            try:
+                results[name] = get_check(name)()
+            except bitrix24_api.RunBudgetExceeded as e:
+                print(f"[{name}] Проверка прервана: {e}")
+                errors[name] = str(e)
+                truncated.append(name)
+            except Exception as e:
+                print(f"[{name}] Произошла ошибка во время выполнения проверки: {e}")
+                errors[name] = str(e)
+
+    bitrix24_api.set_deadline(None)
+
+    return {
+        'portal': portal['name'],
+        'results': results,
+        'errors': errors,
+        'truncated': truncated,
+        'output': output.getvalue(),
+        'duration': time.monotonic() - started,
+    }
+
+
+def make_portal_check(pool, portal, name):
+    """
+    Функция проверки портала для планировщика: проверка выполняется в пуле
+    процессов с крайним сроком текущего запуска, результат выводится отчетом.
+    """
+    def run_portal_check():
+        report = pool.submit(run_portal, portal, [name], bitrix24_api.get_deadline()).result()
+        print_report([report])
+        if name in report['truncated']:
+            raise bitrix24_api.RunBudgetExceeded(report['errors'][name])
+        if name in report['errors']:
+            raise RuntimeError(report['errors'][name])
+        return report['results'][name]
+
+    return run_portal_check
+
+
+def print_report(reports):
+    """
+    Вывод сводного отчета по всем порталам.
+    """
+    for report in reports:
+        print(f"\n===== Портал {report['portal']} =====")
+        print(report['output'])
+
+    print("\n===== Сводный отчет =====")
+    for report in reports:
+        print(f"Портал {report['portal']} (проверки выполнены за {report['duration']:.1f} с):")
+        for name, items in report['results'].items():
+            print(f"  {name}: найдено {len(items)}")
+        for name, error in report['errors'].items():
+            print(f"  {name}: ошибка - {error}")
+
+
+def run_portals(portals, max_workers=None, checks=None):
+    """
+    Параллельный запуск проверок по всем порталам в пуле процессов.
+    Если задан checks, у каждого портала запускаются только эти проверки.
+    """
+    if checks:
+        portals = [
+            dict(portal, checks=[name for name in portal.get('checks', CHECK_MODULES) if name in checks])
+            for portal in portals
+        ]
+
+    timezone = pytz.timezone('Europe/Moscow')
+    current_time = datetime.now(timezone).strftime('%Y-%m-%d %H:%M:%S')
+    print(f"\nЗапуск проверок по порталам ({len(portals)}) в {current_time}\n")
+
+    max_workers = min(len(portals), max_workers or config.PORTAL_WORKERS or os.cpu_count())
+    with create_pool(create_rate_limiters(portals), max_workers) as pool:
+        reports = list(pool.map(run_portal, portals))
+
+    print_report(reports)
+    return reports
+
+
+def run_portals_scheduler(portals, max_workers=None):
+    """
+    Планировщик многопортального режима: каждая проверка каждого портала -
+    отдельная задача (main.CheckJob) со своим интервалом, бюджетом времени
+    и адаптивным интервалом. Проверки выполняются в общем пуле процессов.
+    """
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    from main import CheckJob, WorkingHours
+
+    jobs = [(portal, name) for portal in portals for name in portal.get('checks', CHECK_MODULES)]
+    rate_limiters = create_rate_limiters(portals)
+    max_workers = min(len(jobs), max_workers or config.PORTAL_WORKERS or os.cpu_count())
+    pool = create_pool(rate_limiters, max_workers)
+
+    scheduler = BlockingScheduler(
+        timezone='Europe/Moscow',
+        job_defaults={
+            'max_instances': 1,
+            'coalesce': True,
+            'misfire_grace_time': config.SCHEDULE_MISFIRE_GRACE,
+        },
+        # Задачи ждут результатов пула, поэтому потоков нужно не меньше числа задач
+        executors={'default': {'type': 'threadpool', 'max_workers': len(jobs)}}
+    )
+    working_hours = WorkingHours()
+    timezone = pytz.timezone('Europe/Moscow')
+
+    for portal, name in jobs:
+        job_id = f"{portal['name']}:{name}"
+        interval_minutes = portal.get('check_intervals', {}).get(name, config.CHECK_INTERVALS[name])
+        job = CheckJob(
+            scheduler, job_id, make_portal_check(pool, portal, name), interval_minutes, working_hours,
+            rate_limiter=rate_limiters[portal['name']]
+        )
+        scheduler.add_job(
+            job,
+            IntervalTrigger(minutes=interval_minutes),
+            id=job_id,
+            name=job_id,
+            next_run_time=datetime.now(timezone)
+        )
+        print(f"[{job_id}] Интервал запуска: {interval_minutes} мин.")
+
+    print(f"Планировщик проверок по порталам запущен (процессов: {max_workers}).")
+
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        print("Планировщик остановлен.")
+    finally:
+        pool.shutdown()
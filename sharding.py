@@ -0,0 +1,215 @@
+import multiprocessing
+import queue
+import sys
+import time
+from collections import Counter, deque
+
+import config
+import bitrix24_api
+from checks import get_check_function
+
+
+def _get_check_module(name):
+    """
+    Модуль проверки. Загружается через get_check_function, чтобы после импорта
+    подмодуля имя проверки в пакете checks по-прежнему было функцией.
+    """
+    return sys.modules[get_check_function(name).__module__]
+
+
+_deal_check = _get_check_module('check_deal_not_moved')
+_contact_check = _get_check_module('check_contact_name_missing')
+
+
+# Проверки, которые можно выполнять по диапазонам ID:
+#   get_max_id - наибольший ID в выборке проверки
+#   fetch      - получение записей по диапазону ID
+#   find       - отбор записей, попадающих под условие проверки
+#   report     - вывод итогового списка
+#   key        - поле результата с ID записи (для упорядочивания при слиянии)
+SHARDABLE_CHECKS = {
+    'check_deal_not_moved': {
+        'title': "[Проверка 3] Сделки, не переведенные по воронке",
+        'get_max_id': _deal_check.get_max_deal_id,
+        'fetch': _deal_check.get_deals_in_general_pipeline,
+        'find': _deal_check.find_deals_not_moved,
+        'report': _deal_check.report_deals_not_moved,
+        'key': 'deal_id',
+    },
+    'check_contact_name_missing': {
+        'title': "[Проверка 4] Контакты без имени",
+        'get_max_id': _contact_check.get_max_contact_id,
+        'fetch': _contact_check.get_contacts_without_name,
+        'find': _contact_check.find_contacts_to_notify,
+        'report': _contact_check.report_contacts_to_notify,
+        'key': 'contact_id',
+    },
+}
+
+
+def make_shards(max_id, shard_count):
+    """
+    Разбиение диапазона ID [1, max_id] на shard_count диапазонов (first_id, last_id).
+    """
+    shard_size = max(1, -(-max_id // shard_count))
+    return [(first_id, min(first_id + shard_size - 1, max_id)) for first_id in range(1, max_id + 1, shard_size)]
+
+
+def _shard_worker(worker_id, check_name, portal_settings, rate_limiter, deadline, task_queue, result_queue):
+    """
+    Процесс-обработчик: получает номера диапазонов из своей очереди и возвращает
+    найденные записи или ошибку обработки диапазона.
+    """
+    bitrix24_api.configure(rate_limiter=rate_limiter, **portal_settings)
+    bitrix24_api.set_deadline(deadline)
+    spec = SHARDABLE_CHECKS[check_name]
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        shard_index, id_range = task
+        try:
+            items = spec['find'](spec['fetch'](id_range=id_range))
+        except bitrix24_api.RunBudgetExceeded as e:
+            result_queue.put((worker_id, shard_index, None, ('budget', str(e))))
+        except Exception as e:
+            result_queue.put((worker_id, shard_index, None, ('error', f"{type(e).__name__}: {e}")))
+        else:
+            result_queue.put((worker_id, shard_index, items, None))
+
+
+class ShardCoordinator:
+    """
+    Распределение диапазонов ID между процессами и сбор частичных результатов.
+
+    Каждому процессу выдается по одному диапазону, поэтому координатор всегда
+    знает, какой диапазон обрабатывается в каком процессе. Если процесс
+    завершился, не вернув результат, его диапазон возвращается в очередь,
+    а вместо процесса запускается новый. Ошибка при обработке диапазона
+    (в том числе превышение времени проверки) останавливает всю проверку. Все процессы расходуют общий
+    бюджет запросов портала (частоту и квоту).
+    """
+
+    def __init__(self, check_name, shards, workers):
+        self.check_name = check_name
+        self.shards = shards
+        self.worker_count = min(workers, len(shards))
+        self.portal_settings = bitrix24_api.get_portal_settings()
+        # Крайний срок проверки передается процессам явно (в том числе при запуске через spawn)
+        self.deadline = bitrix24_api.get_deadline()
+        # Бюджет запросов портала общий для координатора, других проверок и всех процессов
+        self.rate_limiter = bitrix24_api.get_rate_limiter()
+        self.result_queue = multiprocessing.Queue()
+
+        self.pending = deque(range(len(shards)))
+        self.results = {}
+        self.attempts = Counter()
+        self.workers = {}
+        self.next_worker_id = 0
+
+    def start_worker(self):
+        worker_id = self.next_worker_id
+        self.next_worker_id += 1
+        task_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_shard_worker,
+            args=(
+                worker_id, self.check_name, self.portal_settings, self.rate_limiter, self.deadline,
+                task_queue, self.result_queue
+            ),
+            name=f"{self.check_name}-shard-worker-{worker_id}"
+        )
+        process.start()
+        self.workers[worker_id] = {'process': process, 'tasks': task_queue, 'shard': None}
+
+    def assign_shards(self):
+        for worker in self.workers.values():
+            if worker['shard'] is not None:
+                continue
+            # Диапазон мог быть выполнен процессом, который завершился после отправки результата
+            while self.pending and self.pending[0] in self.results:
+                self.pending.popleft()
+            if not self.pending:
+                return
+            shard_index = self.pending.popleft()
+            self.attempts[shard_index] += 1
+            worker['shard'] = shard_index
+            worker['tasks'].put((shard_index, self.shards[shard_index]))
+
+    def collect_results(self, timeout):
+        try:
+            message = self.result_queue.get(timeout=timeout)
+            while True:
+                worker_id, shard_index, items, error = message
+                if worker_id in self.workers and self.workers[worker_id]['shard'] == shard_index:
+                    self.workers[worker_id]['shard'] = None
+                if error:
+                    kind, error_message = error
+                    if kind == 'budget':
+                        raise bitrix24_api.RunBudgetExceeded(error_message)
+                    raise RuntimeError(f"Ошибка при обработке диапазона ID {self.shards[shard_index]}: {error_message}")
+                self.results.setdefault(shard_index, items)
+                message = self.result_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def replace_dead_workers(self):
+        for worker_id, worker in list(self.workers.items()):
+            if worker['process'].is_alive():
+                continue
+
+            del self.workers[worker_id]
+            shard_index = worker['shard']
+            if shard_index is not None and shard_index not in self.results:
+                if self.attempts[shard_index] >= config.SHARD_MAX_ATTEMPTS:
+                    raise RuntimeError(
+                        f"Диапазон ID {self.shards[shard_index]} не обработан за {self.attempts[shard_index]} попыток."
+                    )
+                print(f"Процесс {worker['process'].name} завершился (код {worker['process'].exitcode}), "
+                      f"диапазон ID {self.shards[shard_index]} возвращен в очередь.")
+                self.pending.appendleft(shard_index)
+            self.start_worker()
+
+    def run(self):
+        for _ in range(self.worker_count):
+            self.start_worker()
+
+        try:
+            while len(self.results) < len(self.shards):
+                self.assign_shards()
+                self.collect_results(timeout=0.5)
+                # Сначала собираем результаты, чтобы не отдавать заново уже выполненные диапазоны
+                self.replace_dead_workers()
+        finally:
+            for worker in self.workers.values():
+                worker['tasks'].put(None)
+            for worker in self.workers.values():
+                worker['process'].join(timeout=5)
+                if worker['process'].is_alive():
+                    worker['process'].terminate()
+
+        # Слияние в порядке диапазонов и ID, независимо от порядка завершения процессов
+        key = SHARDABLE_CHECKS[self.check_name]['key']
+        merged = [item for shard_index in range(len(self.shards)) for item in self.results[shard_index]]
+        return sorted(merged, key=lambda item: int(item[key]))
+
+
+def run_sharded_check(check_name, workers=None):
+    """
+    Выполнение проверки по диапазонам ID в нескольких процессах.
+    """
+    workers = workers or config.SHARD_WORKERS
+    spec = SHARDABLE_CHECKS[check_name]
+    started = time.monotonic()
+
+    max_id = spec['get_max_id']()
+    shards = make_shards(max_id, workers * config.SHARDS_PER_WORKER) if max_id else []
+    print(f"{spec['title']}: диапазонов ID - {len(shards)}, процессов - {min(workers, len(shards))}")
+
+    items = ShardCoordinator(check_name, shards, workers).run() if shards else []
+    print(f"Диапазоны обработаны за {time.monotonic() - started:.1f} с")
+
+    spec['report'](items)
+    return items
+
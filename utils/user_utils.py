@@ -1,4 +1,20 @@
+import time
+
+import bitrix24_api
 from bitrix24_api import call_api
+from config import USER_NAMES_CACHE_TTL
+
+# Кэш имен пользователей: (вебхук, ID) -> (имя, момент устаревания).
+# Вебхук в ключе разделяет порталы, срок жизни позволяет увидеть переименования.
+_user_names_cache = {}
+
+
+def clear_user_names_cache():
+    """
+    Очистка кэша имен пользователей.
+    """
+    _user_names_cache.clear()
+
 
 def get_user_names(user_ids):
     """
@@ -6,15 +22,25 @@ def get_user_names(user_ids):
     """
     user_names = {}
     unique_user_ids = list(set(user_ids))
+    webhook_url = bitrix24_api.get_webhook_url()
+    now = time.monotonic()
 
     for user_id in unique_user_ids:
+        cache_key = (webhook_url, user_id)
+        cached = _user_names_cache.get(cache_key)
+        if cached and cached[1] > now:
+            user_names[user_id] = cached[0]
+            continue
+
         params = {'ID': user_id}
         data = call_api('user.get', params=params, http_method='GET')
         if data and 'result' in data and data['result']:
             user = data['result'][0]
             user_names[user_id] = f"{user['NAME']} {user['LAST_NAME']}"
+            _user_names_cache[cache_key] = (user_names[user_id], now + USER_NAMES_CACHE_TTL)
         else:
             print(f"Не удалось получить данные для пользователя ID {user_id}")
             user_names[user_id] = f"ID {user_id}"
+            _user_names_cache.pop(cache_key, None)
 
     return user_names